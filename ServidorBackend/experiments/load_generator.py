@@ -0,0 +1,268 @@
+"""
+Open-loop load generator for the fog node /analyze endpoint.
+
+Requests are fired at scheduled arrival times (steady, poisson or burst)
+regardless of how fast the server answers, so queueing at the fog node shows
+up as latency instead of silently lowering the offered load.
+
+Inputs are local stand-ins for the camera:
+  --images DIR       JPEGs sent as imageBase64 (round robin)
+  --video FILE       frames of a looping video file sent as imageBase64
+  --rtsp-url URL     rtsp_url passed to the server (e.g. a local mediamtx);
+                     with --publish-video FILE a looping ffmpeg publisher is
+                     started for that URL
+
+Per-request rows use the results_latency.csv schema read by plot_results.py
+(no cloud stage offline: ts_cloud = ts_fog_res, lat_cloud = 0), and a
+throughput-vs-latency summary row is written per offered rate.
+
+Example:
+  python load_generator.py --url http://localhost:5000/analyze --images ./frames \\
+      --pattern poisson --rates 1 2 4 8 16 --duration 30
+"""
+import argparse
+import base64
+import csv
+import glob
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+LATENCY_HEADER = ['event_id', 'scenario', 'ts_sensor', 'ts_fog_send', 'ts_fog_res', 'ts_cloud',
+                  'lat_fog', 'lat_cloud', 'lat_e2e']
+CURVE_HEADER = ['scenario', 'pattern', 'offered_rps', 'achieved_rps', 'count', 'errors',
+                'p50', 'p95', 'p99', 'max']
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+# ==========================
+# ARRIVALS
+# ==========================
+def arrival_offsets(pattern, rate, duration, burst_size=10):
+    """Seconds (relative to the start of the run) at which each request is sent."""
+    offsets = []
+    if pattern == 'steady':
+        interval = 1.0 / rate
+        t = 0.0
+        while t < duration:
+            offsets.append(t)
+            t += interval
+    elif pattern == 'poisson':
+        t = random.expovariate(rate)
+        while t < duration:
+            offsets.append(t)
+            t += random.expovariate(rate)
+    elif pattern == 'burst':
+        # Same mean rate, delivered as `burst_size` simultaneous requests
+        period = burst_size / rate
+        t = 0.0
+        while t < duration:
+            offsets.extend([t] * burst_size)
+            t += period
+    else:
+        raise ValueError(f"Unknown arrival pattern: {pattern}")
+    return offsets
+
+
+# ==========================
+# INPUTS
+# ==========================
+class ImageSource:
+    def __init__(self, directory):
+        paths = sorted(p for ext in ('*.jpg', '*.jpeg', '*.png')
+                       for p in glob.glob(os.path.join(directory, ext)))
+        if not paths:
+            raise FileNotFoundError(f"No images found in {directory}")
+        self.frames = []
+        for p in paths:
+            with open(p, 'rb') as f:
+                self.frames.append(base64.b64encode(f.read()).decode('utf-8'))
+        self.index = 0
+        self.lock = threading.Lock()
+
+    def payload(self):
+        with self.lock:
+            frame = self.frames[self.index % len(self.frames)]
+            self.index += 1
+        return {'imageBase64': frame}
+
+
+class VideoSource:
+    """
+    Pre-encodes up to `max_frames` frames of a video file (every `stride`-th
+    frame) so that JPEG encoding does not compete with the request threads.
+    """
+
+    def __init__(self, path, stride=5, max_frames=300, quality=85):
+        import cv2
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise FileNotFoundError(f"Cannot open video {path}")
+        self.frames = []
+        i = 0
+        while len(self.frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if i % stride == 0:
+                ok, buf = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+                if ok:
+                    self.frames.append(base64.b64encode(buf).decode('utf-8'))
+            i += 1
+        cap.release()
+        if not self.frames:
+            raise ValueError(f"No frames decoded from {path}")
+        self.index = 0
+        self.lock = threading.Lock()
+
+    def payload(self):
+        with self.lock:
+            frame = self.frames[self.index % len(self.frames)]
+            self.index += 1
+        return {'imageBase64': frame}
+
+
+class RtspSource:
+    def __init__(self, rtsp_url, publish_video=None):
+        self.rtsp_url = rtsp_url
+        self.publisher = None
+        if publish_video:
+            # Needs an RTSP server listening on rtsp_url (e.g. mediamtx)
+            self.publisher = subprocess.Popen(
+                ['ffmpeg', '-loglevel', 'error', '-re', '-stream_loop', '-1', '-i', publish_video,
+                 '-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'zerolatency', '-an',
+                 '-f', 'rtsp', rtsp_url])
+            time.sleep(2)
+
+    def payload(self):
+        return {'rtsp_url': self.rtsp_url}
+
+    def close(self):
+        if self.publisher is not None:
+            self.publisher.terminate()
+            self.publisher.wait()
+
+
+# ==========================
+# RUN
+# ==========================
+def send_request(url, source, scenario, ts_sensor, timeout):
+    event_id = f"load-{scenario}-{uuid.uuid4()}"
+    body = dict(source.payload(), event_id=event_id, sensors={}, include_image=False)
+    req = urllib.request.Request(url, data=json.dumps(body).encode('utf-8'),
+                                 headers={'Content-Type': 'application/json'})
+    ts_send = now_ms()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+        ts_res = now_ms()
+    except Exception as e:
+        print(f"[{scenario}] {event_id} failed: {type(e).__name__}: {e}")
+        return None
+
+    lat_fog = ts_res - ts_send
+    # ts_sensor is the scheduled arrival: time spent waiting for a free worker counts
+    return [event_id, scenario, ts_sensor, ts_send, ts_res, ts_res, lat_fog, 0, ts_res - ts_sensor]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return float('nan')
+    k = (len(sorted_values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def run_rate(url, source, pattern, rate, duration, burst_size, workers, timeout, writer):
+    scenario = f"{pattern}@{rate:g}rps"
+    offsets = arrival_offsets(pattern, rate, duration, burst_size)
+    print(f"\n[{scenario}] {len(offsets)} requests over {duration}s")
+
+    futures = []
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for offset in offsets:
+            delay = start + offset - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            ts_sensor = int((start + offset) * 1000)
+            futures.append(pool.submit(send_request, url, source, scenario, ts_sensor, timeout))
+    # The pool waits for in-flight requests, so this covers the whole run
+    elapsed = max(duration, time.time() - start)
+
+    rows = [f.result() for f in futures]
+    ok = [r for r in rows if r is not None]
+    for r in ok:
+        writer.writerow(r)
+
+    e2e = sorted(r[-1] for r in ok)
+    summary = [scenario, pattern, rate, round(len(ok) / elapsed, 3), len(ok), len(rows) - len(ok),
+               percentile(e2e, 0.5), percentile(e2e, 0.95), percentile(e2e, 0.99), e2e[-1] if e2e else float('nan')]
+    print(f"[{scenario}] achieved={summary[3]} rps ok={len(ok)} errors={summary[5]} "
+          f"p50={summary[6]:.0f} p95={summary[7]:.0f} p99={summary[8]:.0f} ms")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load generator for /analyze")
+    parser.add_argument('--url', default='http://localhost:5000/analyze')
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument('--images', help="directory with JPEG/PNG frames")
+    src.add_argument('--video', help="video file whose frames are sent as imageBase64")
+    src.add_argument('--rtsp-url', help="RTSP URL for the server to capture from")
+    parser.add_argument('--publish-video', help="with --rtsp-url: loop this file into the RTSP server via ffmpeg")
+    parser.add_argument('--video-stride', type=int, default=5)
+    parser.add_argument('--pattern', choices=['steady', 'poisson', 'burst'], default='poisson')
+    parser.add_argument('--rates', type=float, nargs='+', default=[1, 2, 4, 8],
+                        help="offered request rates (req/s) to sweep")
+    parser.add_argument('--duration', type=float, default=30, help="seconds per rate")
+    parser.add_argument('--burst-size', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=64, help="max in-flight requests")
+    parser.add_argument('--timeout', type=float, default=15)
+    parser.add_argument('--cooldown', type=float, default=5, help="seconds between rates")
+    parser.add_argument('--out', default='results_load_latency.csv',
+                        help="per-request CSV (results_latency.csv schema)")
+    parser.add_argument('--curve-out', default='results_load_curve.csv',
+                        help="throughput vs latency summary per rate")
+    args = parser.parse_args()
+
+    if args.images:
+        source = ImageSource(args.images)
+    elif args.video:
+        source = VideoSource(args.video, stride=args.video_stride)
+    else:
+        source = RtspSource(args.rtsp_url, args.publish_video)
+
+    curve = []
+    try:
+        with open(args.out, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(LATENCY_HEADER)
+            for i, rate in enumerate(args.rates):
+                if i:
+                    time.sleep(args.cooldown)
+                curve.append(run_rate(args.url, source, args.pattern, rate, args.duration,
+                                      args.burst_size, args.workers, args.timeout, writer))
+                f.flush()
+    finally:
+        if isinstance(source, RtspSource):
+            source.close()
+
+    with open(args.curve_out, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CURVE_HEADER)
+        writer.writerows(curve)
+    print(f"\nSaved {args.out} and {args.curve_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,21 @@
 import pandas as pd
 import matplotlib.pyplot as plt
+import argparse
+import io
+import json
+import math
 import os
+import time
+from collections import OrderedDict
 
-def analyze_latency():
-    csv_path = 'results_latency.csv'
+LATENCY_CSV = 'results_latency.csv'
+COLDSTART_CSV = 'results_coldstart_v3.csv'
+INSITU_CSV = 'results_insitu_v1.csv'
+LATENCY_METRICS = ['lat_fog', 'lat_cloud', 'lat_e2e']
+COLDSTART_METRICS = ['lambda_init_ms', 'lambda_duration_ms', 'client_invoke_ms']
+QUANTILES = [0.5, 0.95, 0.99]
+
+def analyze_latency(csv_path=LATENCY_CSV):
     if not os.path.exists(csv_path):
         print(f"File {csv_path} not found. Run experiment_latency.js first.")
         return
@@ -39,7 +51,7 @@ def analyze_latency():
     print("Saved latency_boxplot.png")
 
 def analyze_cold_start():
-    csv_path = 'results_coldstart_v3.csv'
+    csv_path = COLDSTART_CSV
     if not os.path.exists(csv_path):
         print(f"File {csv_path} not found.")
         return
@@ -68,7 +80,7 @@ def analyze_cold_start():
     print("Saved coldstart_breakdown.png")
 
     # 2. In-Situ Analysis (Real Pipeline)
-    insitu_path = 'results_insitu_v1.csv'
+    insitu_path = INSITU_CSV
     if os.path.exists(insitu_path):
         df_insitu = pd.read_csv(insitu_path)
         df_insitu = df_insitu[df_insitu['status'] == 'SUCCESS']
@@ -84,6 +96,337 @@ def analyze_cold_start():
         plt.savefig('insitu_pipeline_boxplot.png')
         print("Saved insitu_pipeline_boxplot.png")
 
+# ==========================
+# STREAMING ANALYSIS
+# ==========================
+class QuantileSketch:
+    """
+    Mergeable log-bucket quantile sketch (DDSketch style).
+    Quantiles are within `relative_accuracy` of the true value and memory is
+    bounded by `max_bins`, no matter how many values are added.
+    Values <= 0 are counted in a dedicated zero bucket.
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_bins=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        value = float(value)
+        if math.isnan(value):
+            return
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + 1
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, n in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+        return self
+
+    def _collapse(self):
+        # Fold the lowest buckets together: keeps the tail (p95/p99) accurate
+        keys = sorted(self.bins)
+        overflow = keys[:len(keys) - self.max_bins + 1]
+        folded = sum(self.bins.pop(k) for k in overflow)
+        self.bins[overflow[-1]] = self.bins.get(overflow[-1], 0) + folded
+
+    def quantile(self, q):
+        if self.count == 0:
+            return math.nan
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return min(self.min, 0.0)
+        cumulative = self.zero_count
+        for key in sorted(self.bins):
+            cumulative += self.bins[key]
+            if cumulative > rank:
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'max_bins': self.max_bins,
+            'bins': {str(k): n for k, n in self.bins.items()},
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        sketch = cls(d['relative_accuracy'], d['max_bins'])
+        sketch.bins = {int(k): n for k, n in d['bins'].items()}
+        sketch.zero_count = d['zero_count']
+        sketch.count = d['count']
+        if sketch.count:
+            sketch.min, sketch.max = d['min'], d['max']
+        return sketch
+
+
+def read_new_rows(path, cursor, chunksize):
+    """
+    Yield DataFrames with the rows appended to `path` since `cursor['offset']`.
+    Only complete lines are consumed, so a file that is still being written
+    can be polled again later without losing or duplicating rows.
+    """
+    if not os.path.exists(path):
+        return
+    if os.path.getsize(path) < cursor.get('offset', 0):
+        # File was truncated / rotated: start over
+        cursor.clear()
+
+    with open(path, 'rb') as f:
+        if 'header' not in cursor:
+            header = f.readline()
+            if not header.endswith(b'\n'):
+                return
+            cursor['header'] = header.decode('utf-8')
+            cursor['offset'] = len(header)
+
+        header = cursor['header'].encode('utf-8')
+        f.seek(cursor['offset'])
+        lines = []
+        while True:
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                break
+            cursor['offset'] += len(line)
+            if line.strip():
+                lines.append(line)
+            if len(lines) >= chunksize:
+                yield pd.read_csv(io.BytesIO(header + b''.join(lines)))
+                lines = []
+        if lines:
+            yield pd.read_csv(io.BytesIO(header + b''.join(lines)))
+
+
+def plain_value(value):
+    """numpy scalars -> Python and NaN -> None, so keys match across rows and survive JSON state."""
+    if hasattr(value, 'item'):
+        value = value.item()
+    if value is pd.NA or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+class StreamingAnalysis:
+    """
+    Constant-memory version of analyze_latency / analyze_cold_start.
+    Keeps one QuantileSketch per (source, group, metric), per time window
+    (only the `max_windows` most recent windows by time) and per joined cold-start/in-situ
+    type, matching rows of the different CSVs by event_id.
+    """
+
+    def __init__(self, window_minutes=60, max_windows=48, join_buffer=50000, latency_csv=LATENCY_CSV):
+        self.latency_csv = latency_csv
+        self.window_ms = int(window_minutes * 60 * 1000)
+        self.max_windows = max_windows
+        self.join_buffer = join_buffer
+        self.totals = {}
+        self.windows = {}
+        self.cursors = {}
+        # event_id -> latency row / cold-start type, bounded (oldest evicted)
+        self.pending_latency = OrderedDict()
+        self.pending_type = OrderedDict()
+
+    def _sketch(self, table, key):
+        if key not in table:
+            table[key] = QuantileSketch()
+        return table[key]
+
+    def _add(self, source, group, metric, value, ts_ms=None):
+        group = plain_value(group)
+        self._sketch(self.totals, (source, group, metric)).add(value)
+        if ts_ms is None or math.isnan(ts_ms):
+            return
+        window = int(ts_ms // self.window_ms * self.window_ms)
+        if window not in self.windows:
+            # Files are read one after another, so windows do not arrive in time
+            # order: evict by timestamp, and ignore rows older than everything kept
+            if len(self.windows) >= self.max_windows and window < min(self.windows):
+                return
+            self.windows[window] = {}
+            while len(self.windows) > self.max_windows:
+                del self.windows[min(self.windows)]
+        self._sketch(self.windows[window], (source, group, metric)).add(value)
+
+    def _remember(self, buffer, event_id, value):
+        buffer[event_id] = value
+        buffer.move_to_end(event_id)
+        while len(buffer) > self.join_buffer:
+            buffer.popitem(last=False)
+
+    def _join(self, event_id, latency_row=None, run_type=None):
+        if latency_row is None:
+            latency_row = self.pending_latency.pop(event_id, None)
+        if run_type is None:
+            run_type = self.pending_type.pop(event_id, None)
+        if latency_row is None or run_type is None:
+            return False
+        ts_ms, values = latency_row
+        for metric, value in values.items():
+            self._add('joined', run_type, metric, value, ts_ms)
+        return True
+
+    def consume_latency(self, df):
+        group = df['scenario'] if 'scenario' in df.columns else pd.Series('all', index=df.index)
+        ts = pd.to_numeric(df['ts_sensor'], errors='coerce') if 'ts_sensor' in df.columns else pd.Series(math.nan, index=df.index)
+        for i in df.index:
+            values = {m: df.at[i, m] for m in LATENCY_METRICS if m in df.columns and pd.notna(df.at[i, m])}
+            for metric, value in values.items():
+                self._add('latency', group[i], metric, value, ts[i])
+            event_id = plain_value(df.at[i, 'event_id'])
+            if not self._join(event_id, latency_row=(ts[i], values)):
+                self._remember(self.pending_latency, event_id, (ts[i], values))
+
+    def _consume_typed(self, df, source, metrics):
+        ts = pd.to_datetime(df['timestamp'], errors='coerce', utc=True)
+        ts_ms = ts.map(lambda t: t.value / 1e6 if pd.notna(t) else math.nan)
+        for i in df.index:
+            run_type = plain_value(df.at[i, 'type'])
+            for metric in metrics:
+                if pd.notna(df.at[i, metric]):
+                    self._add(source, run_type, metric, df.at[i, metric], ts_ms[i])
+            if 'event_id' in df.columns:
+                event_id = plain_value(df.at[i, 'event_id'])
+                if not self._join(event_id, run_type=run_type):
+                    self._remember(self.pending_type, event_id, run_type)
+
+    def consume_cold_start(self, df):
+        df = df[df['parse_ok'] == True]
+        self._consume_typed(df, 'coldstart', COLDSTART_METRICS)
+
+    def consume_insitu(self, df):
+        df = df[df['status'] == 'SUCCESS']
+        self._consume_typed(df, 'insitu', ['total_pipeline_ms'])
+
+    def update(self, chunksize=10000):
+        """Read whatever was appended to the CSVs since the last call."""
+        sources = [
+            (self.latency_csv, self.consume_latency),
+            (COLDSTART_CSV, self.consume_cold_start),
+            (INSITU_CSV, self.consume_insitu),
+        ]
+        rows = 0
+        for path, consume in sources:
+            cursor = self.cursors.setdefault(path, {})
+            for chunk in read_new_rows(path, cursor, chunksize):
+                consume(chunk)
+                rows += len(chunk)
+        return rows
+
+    def report(self, show_windows=False):
+        def rows(table):
+            for (source, group, metric), sketch in sorted(table.items(), key=lambda kv: tuple(map(str, kv[0]))):
+                yield {
+                    'source': source, 'group': group, 'metric': metric, 'count': sketch.count,
+                    **{f'p{int(q * 100)}': round(sketch.quantile(q), 1) for q in QUANTILES},
+                }
+
+        print("\n=== Streaming Latency Quantiles (ms) ===")
+        if self.totals:
+            print(pd.DataFrame(rows(self.totals)).to_string(index=False))
+        if show_windows:
+            for window, table in sorted(self.windows.items()):
+                start = pd.to_datetime(window, unit='ms', utc=True)
+                print(f"\n--- Window {start.isoformat()} ---")
+                print(pd.DataFrame(rows(table)).to_string(index=False))
+
+    def save_state(self, path):
+        def dump(table):
+            # Keys keep their JSON types (numbers, None) so resumed rows land on the same sketch
+            return [[list(key), sketch.to_dict()] for key, sketch in table.items()]
+
+        state = {
+            'window_ms': self.window_ms,
+            'cursors': self.cursors,
+            'totals': dump(self.totals),
+            'windows': [[window, dump(table)] for window, table in self.windows.items()],
+            'pending_latency': [[k, [None if math.isnan(ts) else ts, v]] for k, (ts, v) in self.pending_latency.items()],
+            'pending_type': list(self.pending_type.items()),
+        }
+        with open(path, 'w') as f:
+            json.dump(state, f, default=float)
+
+    def load_state(self, path):
+        def load(entries):
+            return {tuple(key): QuantileSketch.from_dict(d) for key, d in entries}
+
+        with open(path) as f:
+            state = json.load(f)
+        if state['window_ms'] != self.window_ms:
+            raise ValueError(
+                f"{path} was built with {state['window_ms'] / 60000:g}-minute windows, not "
+                f"{self.window_ms / 60000:g}; pass --window-minutes {state['window_ms'] / 60000:g} "
+                f"or use a new --state file")
+        self.cursors = state['cursors']
+        self.totals = load(state['totals'])
+        self.windows = {window: load(entries) for window, entries in state['windows']}
+        self.pending_latency = OrderedDict(
+            (k, (math.nan if ts is None else ts, v)) for k, (ts, v) in state['pending_latency'])
+        self.pending_type = OrderedDict(state['pending_type'])
+
+
+def analyze_streaming(chunksize=10000, window_minutes=60, follow=None, state_path=None, show_windows=False,
+                      latency_csv=LATENCY_CSV):
+    analysis = StreamingAnalysis(window_minutes=window_minutes, latency_csv=latency_csv)
+    if state_path and os.path.exists(state_path):
+        analysis.load_state(state_path)
+        print(f"Resumed streaming state from {state_path}")
+
+    while True:
+        new_rows = analysis.update(chunksize)
+        if new_rows or follow is None:
+            print(f"\nProcessed {new_rows} new rows")
+            analysis.report(show_windows=show_windows)
+            if state_path:
+                analysis.save_state(state_path)
+        if follow is None:
+            return analysis
+        time.sleep(follow)
+
+
 if __name__ == "__main__":
-    analyze_latency()
-    analyze_cold_start()
+    parser = argparse.ArgumentParser(description="Latency / cold start analysis of the experiment CSVs")
+    parser.add_argument('--latency-csv', default=LATENCY_CSV,
+                        help="latency CSV to analyze (e.g. results_load_latency.csv from load_generator.py)")
+    parser.add_argument('--stream', action='store_true', help="constant-memory chunked analysis with quantile sketches")
+    parser.add_argument('--chunksize', type=int, default=10000)
+    parser.add_argument('--window-minutes', type=float, default=60)
+    parser.add_argument('--windows', action='store_true', help="also print per-window quantiles")
+    parser.add_argument('--follow', type=float, metavar='SECONDS', help="keep polling the CSVs for new rows")
+    parser.add_argument('--state', help="JSON file to persist sketches and file offsets between runs")
+    args = parser.parse_args()
+
+    if args.stream:
+        analyze_streaming(args.chunksize, args.window_minutes, args.follow, args.state, args.windows,
+                          args.latency_csv)
+    else:
+        analyze_latency(args.latency_csv)
+        analyze_cold_start()
@@ -291,7 +291,8 @@ app.post('/sensor-data', (req, res) => {
             imageBase64, 
             systemState.sensorData,
             eventId,
-            { ts_backend_receive_sensor, ts_backend_send_jetson }
+            { ts_backend_receive_sensor, ts_backend_send_jetson },
+            true // Disparado por checkThresholds
           );
           
           const ts_backend_response_jetson = aiResult.ts_backend_response_jetson || new Date().getTime(); // Timestamp 5: Respuesta IA
@@ -9,14 +9,16 @@ const axios = require('axios');
  * @param {object} sensorData - Optional sensor context
  * @param {string} eventId - Unique ID for the event context
  * @param {object} timestamps - Observability timestamps { backend_receive }
+ * @param {boolean} sensorTriggered - True when the call comes from a sensor threshold being exceeded
  */
-async function analyze(aiServiceUrl, rtspUrl, imageBase64 = null, sensorData = {}, eventId = null, timestamps = {}) {
+async function analyze(aiServiceUrl, rtspUrl, imageBase64 = null, sensorData = {}, eventId = null, timestamps = {}, sensorTriggered = false) {
   try {
     const payload = {
       event_id: eventId,
       rtsp_url: rtspUrl,
       imageBase64: imageBase64,
       sensors: sensorData,
+      sensor_triggered: sensorTriggered, // El servidor IA salta el pre-filtro si los sensores ya dispararon
       include_image: true, // Solicitar retorno de imagen para S3 (Opción A)
       timestamps: timestamps // Pasar timestamps recolectados hasta ahora
     };
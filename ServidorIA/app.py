@@ -4,7 +4,13 @@ import time
 import base64
 import traceback
 import os
+import json
+import math
+import threading
+from collections import deque
+import numpy as np
 from ultralytics import YOLO
+from tracing import Tracer
 
 app = Flask(__name__)
 
@@ -21,14 +27,85 @@ FIRE_CONFIRM_THR = 0.55
 SMOKE_WARNING_THR = 0.55
 COMBINED_CONFIRM_THR = 0.45
 
+# Fusión temporal por cámara: EMA de scores + histéresis + persistencia de cajas
+TEMPORAL_ENABLED = True
+# Peso del frame nuevo: alpha = 1 - exp(-dt / TAU), con piso MIN_ALPHA para
+# llamadas muy seguidas. Tras ~3 TAU sin frames la evidencia vieja no cuenta.
+TEMPORAL_TAU_S = 5.0
+TEMPORAL_MIN_ALPHA = 0.3
+TEMPORAL_MIN_PERSIST = 2
+TEMPORAL_IOU = 0.3
+TEMPORAL_TTL_S = 120
+TEMPORAL_HISTORY = 200
+FIRE_RELEASE_THR = 0.35
+SMOKE_RELEASE_THR = 0.35
+
+# Inferencia por tiles a resolución completa (fuegos lejanos / pequeños).
+# Solo si el frame es grande o los sensores están elevados.
+TILE_ENABLED = True
+TILE_SIZE = 960
+TILE_OVERLAP = 0.2
+TILE_MIN_W = 2560
+TILE_CONTAIN_THR = 0.8
+
+# Pre-filtro (cascada) antes de YOLO: cantidad de píxeles con color de llama
+# (en píxeles del input, no fracción: una llama chica en un frame grande cuenta
+# igual) y fracción de píxeles tipo humo. Desactivado hasta ajustar los
+# umbrales con tune_screener.py sobre datos de evaluación reales.
+SCREEN_ENABLED = False
+SCREEN_MAX_W = 640
+SCREEN_FIRE_MIN_PX = 20
+SCREEN_SMOKE_THR = 0.05
+SCREEN_SMOKE_MAX_EDGE = 12
+
+# Tracing opt-in: spans por etapa (trace id = event_id) a un JSONL rotativo.
+# Con TRACE_ENABLED=False no se muestrea nada y "trace": true en el request se ignora.
+TRACE_ENABLED = False
+TRACE_SAMPLE_RATE = 0.02
+TRACE_PATH = os.path.join("traces", "spans.jsonl")
+TRACE_MAX_BYTES = 10 * 1024 * 1024
+TRACE_BACKUPS = 5
+TRACE_FLUSH_SPANS = 200
+TRACE_FLUSH_INTERVAL_S = 5
+PROFILE_DIR = os.path.join("traces", "profiles")
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_THRESHOLD_MS = 1500
+
 # Modelo unificado (Fire + Smoke)
 MODEL_PATH = os.path.join("ModeloNuevo", "external_repos", "luminous_yolov8", "weights", "best.pt")
 
+# ROIs por cámara (clave: camera_id o rtsp_url sin query). Formato:
+# {"cam-patio": {"regions": [[x1, y1, x2, y2], ...], "mode": "crop" | "tiles", "mask": true}}
+# Coordenadas normalizadas [0..1] sobre el frame completo.
+CAMERA_ROIS_PATH = "camera_rois.json"
+
 unified_model = None
 models_error = None
 models_load_time = None
 models_ready = False
 
+camera_rois = None
+camera_rois_mtime = None
+
+temporal_tracks = {}
+temporal_lock = threading.Lock()
+temporal_last_prune = 0.0
+
+predict_calls = 0
+
+tracer = Tracer(
+    TRACE_PATH,
+    sample_rate=TRACE_SAMPLE_RATE if TRACE_ENABLED else 0.0,
+    allow_force=TRACE_ENABLED,
+    max_bytes=TRACE_MAX_BYTES,
+    backups=TRACE_BACKUPS,
+    flush_spans=TRACE_FLUSH_SPANS,
+    flush_interval_s=TRACE_FLUSH_INTERVAL_S,
+    profile_dir=PROFILE_DIR if TRACE_ENABLED else None,
+    profile_sample_rate=PROFILE_SAMPLE_RATE,
+    profile_threshold_ms=PROFILE_THRESHOLD_MS,
+)
+
 def log(msg):
     print(msg, flush=True)
 
@@ -87,21 +164,32 @@ def capture_frame_from_rtsp(rtsp_url, timeout_ms=2500):
     cap = None
     try:
         gst = build_gst_pipeline(rtsp_url)
-        cap = cv2.VideoCapture(gst, cv2.CAP_GSTREAMER)
+        with tracer.span("rtsp.gstreamer_open") as sp:
+            cap = cv2.VideoCapture(gst, cv2.CAP_GSTREAMER)
+            if sp is not None:
+                sp["attrs"]["opened"] = cap.isOpened()
 
         if not cap.isOpened():
-            cap = cv2.VideoCapture(rtsp_url)
+            with tracer.span("rtsp.ffmpeg_open") as sp:
+                cap = cv2.VideoCapture(rtsp_url)
+                if sp is not None:
+                    sp["attrs"]["opened"] = cap.isOpened()
 
         if not cap.isOpened():
             return None, "No se pudo conectar al stream RTSP (GStreamer/FFmpeg)"
 
-        start = time.time()
-        while True:
-            ret, frame = cap.read()
-            if ret and frame is not None:
-                return frame, None
-            if (time.time() - start) * 1000 > timeout_ms:
-                return None, "Timeout leyendo frame RTSP"
+        with tracer.span("rtsp.read") as sp:
+            start = time.time()
+            reads = 0
+            while True:
+                ret, frame = cap.read()
+                reads += 1
+                if ret and frame is not None:
+                    tracer.annotate(reads=reads)
+                    return frame, None
+                if (time.time() - start) * 1000 > timeout_ms:
+                    tracer.annotate(reads=reads, timeout=True)
+                    return None, "Timeout leyendo frame RTSP"
 
     except Exception as e:
         return None, f"{type(e).__name__}: {e}"
@@ -123,41 +211,342 @@ def encode_jpg_base64(frame, quality=80):
     return base64.b64encode(buf).decode("utf-8")
 
 # ==========================
-# YOLO INFER
+# ROI
 # ==========================
-def yolo_infer(model: YOLO, frame, conf, iou):
-    results = model.predict(
-        source=frame,
-        conf=conf,
-        iou=iou,
-        verbose=False,
-        max_det=MAX_DETECTIONS
+FULL_FRAME = (0.0, 0.0, 1.0, 1.0)
+
+def camera_key(camera_id, rtsp_url):
+    """
+    Identificador estable de la cámara: camera_id si viene en el request,
+    si no la URL RTSP sin query string.
+    """
+    if camera_id:
+        return str(camera_id)
+    if rtsp_url:
+        return rtsp_url.split("?")[0]
+    return None
+
+def load_camera_rois():
+    """
+    Lee CAMERA_ROIS_PATH y lo recarga solo si cambió en disco.
+    Sin archivo (o inválido) no hay ROIs y se procesa el frame completo.
+    """
+    global camera_rois, camera_rois_mtime
+    if not os.path.exists(CAMERA_ROIS_PATH):
+        camera_rois, camera_rois_mtime = {}, None
+        return camera_rois
+
+    mtime = os.path.getmtime(CAMERA_ROIS_PATH)
+    if camera_rois is not None and mtime == camera_rois_mtime:
+        return camera_rois
+
+    try:
+        with open(CAMERA_ROIS_PATH, "r", encoding="utf-8") as f:
+            camera_rois = validate_camera_rois(json.load(f))
+        log(f"[ROI] ✅ {len(camera_rois)} cámaras con ROI cargadas desde {CAMERA_ROIS_PATH}")
+    except Exception as e:
+        log(f"[ROI] ❌ Error leyendo {CAMERA_ROIS_PATH}: {type(e).__name__}: {e}")
+        camera_rois = {}
+    camera_rois_mtime = mtime
+    return camera_rois
+
+def valid_region(region):
+    return (
+        isinstance(region, list) and len(region) == 4
+        and all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in region)
     )
 
+def validate_camera_rois(data):
+    """
+    Valida la forma de camera_rois.json. Las entradas inválidas se descartan con un
+    log y esa cámara vuelve al frame completo (nunca un 500 en /analyze).
+    """
+    if not isinstance(data, dict):
+        log(f"[ROI] ❌ {CAMERA_ROIS_PATH} debe ser un objeto {{camera: roi}}, no {type(data).__name__}")
+        return {}
+
+    valid = {}
+    for key, roi in data.items():
+        if not isinstance(roi, dict):
+            error = f"se esperaba un objeto, no {type(roi).__name__}"
+        elif not isinstance(roi.get("regions", []), list):
+            error = "'regions' debe ser una lista"
+        elif not all(valid_region(r) for r in roi.get("regions", [])):
+            error = "cada región debe ser [x1, y1, x2, y2] numérico"
+        elif roi.get("mode", "crop") not in ("crop", "tiles"):
+            error = f"mode desconocido {roi.get('mode')!r} (crop | tiles)"
+        else:
+            valid[key] = roi
+            continue
+        log(f"[ROI] ⚠️  ROI de '{key}' ignorada ({error}); se usa el frame completo")
+    return valid
+
+def get_camera_roi(key):
+    if not key:
+        return None
+    roi = load_camera_rois().get(key)
+    if not roi:
+        return None
+    # Descarta regiones vacías (área cero) para no generar recortes inválidos
+    regions = [r for r in (clamp_region(r) for r in roi.get("regions", [])) if r[2] > r[0] and r[3] > r[1]]
+    if not regions:
+        return None
+    return dict(roi, regions=regions)
+
+def clamp_region(region):
+    x1, y1, x2, y2 = [min(max(float(v), 0.0), 1.0) for v in region]
+    return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+def union_region(regions):
+    regions = [clamp_region(r) for r in regions]
+    return (
+        min(r[0] for r in regions), min(r[1] for r in regions),
+        max(r[2] for r in regions), max(r[3] for r in regions),
+    )
+
+def crop_region(frame, region):
     h, w = frame.shape[:2]
-    boxes_out = []
-    best_by_label = {}
+    x1, y1, x2, y2 = region
+    px1, py1 = int(x1 * w), int(y1 * h)
+    px2, py2 = max(int(round(x2 * w)), px1 + 1), max(int(round(y2 * h)), py1 + 1)
+    return frame[py1:py2, px1:px2]
 
-    for r in results:
-        if r.boxes is None:
-            continue
-        for b in r.boxes:
-            cls_id = int(b.cls[0])
-            score = float(b.conf[0])
-            x1, y1, x2, y2 = b.xyxy[0].tolist()
-            label = model.names.get(cls_id, str(cls_id))
-
-            boxes_out.append({
-                "x1": x1 / w, "y1": y1 / h,
-                "x2": x2 / w, "y2": y2 / h,
-                "score": score,
-                "label": label
-            })
+def roi_crops(frame, roi):
+    """
+    Devuelve [(crop, region_normalizada)] según el modo de la cámara:
+      - crop:  un único recorte a la unión de regiones (con máscara opcional
+               fuera de las regiones para no disparar en cielo/ventanas).
+      - tiles: un recorte por región, inferidos en batch.
+    """
+    regions = roi["regions"]
+
+    if roi.get("mode", "crop") == "tiles":
+        return [(crop_region(frame, r), r) for r in regions]
+
+    union = union_region(regions)
+    crop = crop_region(frame, union)
+    if roi.get("mask", False) and len(regions) > 1:
+        ux1, uy1, ux2, uy2 = union
+        uw, uh = ux2 - ux1, uy2 - uy1
+        mask = np.zeros(crop.shape[:2], dtype=np.uint8)
+        for r in regions:
+            local = ((r[0] - ux1) / uw, (r[1] - uy1) / uh, (r[2] - ux1) / uw, (r[3] - uy1) / uh)
+            crop_region(mask, local)[:] = 255
+        crop = cv2.bitwise_and(crop, crop, mask=mask)
+    return [(crop, union)]
+
+def map_boxes_to_frame(boxes, region):
+    """Convierte cajas normalizadas al recorte en cajas normalizadas al frame completo."""
+    x1, y1, x2, y2 = region
+    rw, rh = x2 - x1, y2 - y1
+    return [
+        dict(b,
+             x1=x1 + b["x1"] * rw, y1=y1 + b["y1"] * rh,
+             x2=x1 + b["x2"] * rw, y2=y1 + b["y2"] * rh)
+        for b in boxes
+    ]
+
+def merge_best_by_label(target, best_by_label):
+    for label, score in best_by_label.items():
+        if label not in target or score > target[label]:
+            target[label] = score
+    return target
+
+def prepare_inputs(frame, roi, tiled=False):
+    """
+    Frames a inferir (ya redimensionados) y la región del frame completo que cubre cada uno.
+    Con tiled=True cada recorte grande se parte además en tiles solapados a resolución completa.
+    """
+    crops = roi_crops(frame, roi) if roi else [(frame, FULL_FRAME)]
+    inputs, regions = [], []
+    for crop, region in crops:
+        inputs.append(maybe_resize(crop))
+        regions.append(region)
+        if tiled and crop.shape[1] > RESIZE_MAX_W:
+            for tile, tile_region in tile_crops(crop, region):
+                inputs.append(tile)
+                regions.append(tile_region)
+    return inputs, regions
+
+def collect_detections(outputs, regions):
+    """Une las salidas de yolo_infer_batch de un mismo frame en coordenadas del frame completo."""
+    boxes, best_by_label = [], {}
+    for (b, best), region in zip(outputs, regions):
+        boxes.extend(b if region == FULL_FRAME else map_boxes_to_frame(b, region))
+        merge_best_by_label(best_by_label, best)
+    if len(regions) > 1:
+        # Tiles / regiones solapadas: la misma llama aparece en varios inputs
+        boxes = nms_boxes(boxes, IOU_NMS)
+    return boxes, best_by_label
+
+# ==========================
+# TILES
+# ==========================
+def should_tile(frame, triggered=False, requested=None):
+    if requested is not None:
+        return bool(requested)
+    if not TILE_ENABLED:
+        return False
+    w = frame.shape[1]
+    return w >= TILE_MIN_W or (w > RESIZE_MAX_W and triggered)
+
+def tile_starts(length, tile, step):
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, step))
+    starts.append(length - tile)
+    return starts
+
+def tile_crops(crop, region):
+    """Tiles solapados de TILE_SIZE px sobre crop, con su región normalizada en el frame completo."""
+    h, w = crop.shape[:2]
+    step = max(int(TILE_SIZE * (1 - TILE_OVERLAP)), 1)
+    rx1, ry1, rx2, ry2 = region
+    rw, rh = rx2 - rx1, ry2 - ry1
+
+    tiles = []
+    for y in tile_starts(h, TILE_SIZE, step):
+        for x in tile_starts(w, TILE_SIZE, step):
+            tile = crop[y:y + TILE_SIZE, x:x + TILE_SIZE]
+            th, tw = tile.shape[:2]
+            tiles.append((tile, (
+                rx1 + x / w * rw, ry1 + y / h * rh,
+                rx1 + (x + tw) / w * rw, ry1 + (y + th) / h * rh,
+            )))
+    return tiles
+
+def nms_boxes(boxes, iou_thr):
+    """
+    NMS por label entre tiles. También suprime cajas casi contenidas en otra de
+    mayor score (llama cortada por el borde de un tile).
+    """
+    kept = []
+    for b in sorted(boxes, key=lambda b: b["score"], reverse=True):
+        area_b = max(b["x2"] - b["x1"], 0) * max(b["y2"] - b["y1"], 0)
+        duplicate = False
+        for k in kept:
+            if k["label"] != b["label"]:
+                continue
+            iw = min(b["x2"], k["x2"]) - max(b["x1"], k["x1"])
+            ih = min(b["y2"], k["y2"]) - max(b["y1"], k["y1"])
+            if iw <= 0 or ih <= 0:
+                continue
+            inter = iw * ih
+            area_k = (k["x2"] - k["x1"]) * (k["y2"] - k["y1"])
+            union = area_b + area_k - inter
+            if inter / union >= iou_thr or inter / max(min(area_b, area_k), 1e-12) >= TILE_CONTAIN_THR:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(b)
+    return kept
+
+# ==========================
+# SCREENER
+# ==========================
+def screen_features(frame):
+    """
+    Devuelve (fire_px, smoke_ratio) sobre una miniatura del frame:
+      - fire_px: píxeles rojo/naranja/amarillo saturados y brillantes,
+        reescalados a píxeles del frame de entrada
+      - smoke_ratio: fracción de grises poco saturados y de baja textura
+    """
+    h, w = frame.shape[:2]
+    px_scale = 1.0
+    if w > SCREEN_MAX_W:
+        scale = SCREEN_MAX_W / float(w)
+        frame = cv2.resize(frame, (SCREEN_MAX_W, max(int(h * scale), 1)), interpolation=cv2.INTER_AREA)
+        px_scale = (h * w) / float(frame.shape[0] * frame.shape[1])
+
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    hue, sat, val = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+
+    fire = ((hue <= 35) | (hue >= 165)) & (sat >= 90) & (val >= 160)
+
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    edges = np.abs(cv2.Laplacian(gray, cv2.CV_16S, ksize=3))
+    smoke = (sat <= 45) & (val >= 90) & (val <= 230) & (edges <= SCREEN_SMOKE_MAX_EDGE)
+
+    return float(fire.sum()) * px_scale, float(smoke.mean())
 
-            if label not in best_by_label or score > best_by_label[label]:
-                best_by_label[label] = score
+def sensor_triggered(data):
+    """
+    El backend marca sensor_triggered cuando llama a /analyze porque sus
+    umbrales (checkThresholds, configurables en runtime) se superaron.
+    No se duplican esos umbrales aquí.
+    """
+    return bool(data.get("sensor_triggered", False))
 
-    return boxes_out, best_by_label
+def screen_frames(frames, force=False):
+    """
+    Decide si los frames merecen la pasada completa de YOLO.
+    Devuelve un dict con decision (pass / reject / bypass / disabled) y features.
+    """
+    if not SCREEN_ENABLED:
+        return {"decision": "disabled"}
+    if force:
+        return {"decision": "bypass"}
+
+    fire_px, smoke_ratio = 0.0, 0.0
+    for f in frames:
+        fp, sr = screen_features(f)
+        fire_px, smoke_ratio = max(fire_px, fp), max(smoke_ratio, sr)
+
+    passed = fire_px >= SCREEN_FIRE_MIN_PX or smoke_ratio >= SCREEN_SMOKE_THR
+    return {
+        "decision": "pass" if passed else "reject",
+        "fire_px": round(fire_px, 1),
+        "smoke_ratio": round(smoke_ratio, 5),
+    }
+
+# ==========================
+# YOLO INFER
+# ==========================
+def yolo_infer_batch(model: YOLO, frames, conf, iou):
+    """
+    Inferencia de varios frames en una sola llamada a predict.
+    Devuelve [(boxes, best_by_label)] en el mismo orden que frames.
+    """
+    global predict_calls
+    with tracer.span("predict", inputs=len(frames), first_predict=predict_calls == 0):
+        predict_calls += 1
+        results = model.predict(
+            source=list(frames),
+            conf=conf,
+            iou=iou,
+            verbose=False,
+            max_det=MAX_DETECTIONS
+        )
+
+    outputs = []
+    for frame, r in zip(frames, results):
+        h, w = frame.shape[:2]
+        boxes_out = []
+        best_by_label = {}
+
+        if r.boxes is not None:
+            for b in r.boxes:
+                cls_id = int(b.cls[0])
+                score = float(b.conf[0])
+                x1, y1, x2, y2 = b.xyxy[0].tolist()
+                label = model.names.get(cls_id, str(cls_id))
+
+                boxes_out.append({
+                    "x1": x1 / w, "y1": y1 / h,
+                    "x2": x2 / w, "y2": y2 / h,
+                    "score": score,
+                    "label": label
+                })
+
+                if label not in best_by_label or score > best_by_label[label]:
+                    best_by_label[label] = score
+
+        outputs.append((boxes_out, best_by_label))
+
+    return outputs
+
+def yolo_infer(model: YOLO, frame, conf, iou):
+    return yolo_infer_batch(model, [frame], conf, iou)[0]
 
 def fuse_decision(fire_best, smoke_best):
     fire_score = max(fire_best.values()) if fire_best else 0.0
@@ -174,6 +563,119 @@ def fuse_decision(fire_best, smoke_best):
 
     return "NORMAL", max(fire_score, smoke_score), smoke_score
 
+def decide(best_by_label):
+    fire_best = {'fire': best_by_label['fire']} if 'fire' in best_by_label else {}
+    smoke_best = {'smoke': best_by_label['smoke']} if 'smoke' in best_by_label else {}
+    return fuse_decision(fire_best, smoke_best)
+
+# ==========================
+# TEMPORAL
+# ==========================
+def box_iou(a, b):
+    iw = min(a["x2"], b["x2"]) - max(a["x1"], b["x1"])
+    ih = min(a["y2"], b["y2"]) - max(a["y1"], b["y1"])
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    union = (a["x2"] - a["x1"]) * (a["y2"] - a["y1"]) + (b["x2"] - b["x1"]) * (b["y2"] - b["y1"]) - inter
+    return inter / union if union > 0 else 0.0
+
+def boxes_persist(prev, curr):
+    return any(box_iou(p, c) >= TEMPORAL_IOU for p in prev for c in curr)
+
+def new_track():
+    return {
+        "state": "NORMAL",
+        "fire_ema": None, "smoke_ema": None,
+        "fire_persist": 0, "smoke_persist": 0,
+        "fire_boxes": [], "smoke_boxes": [],
+        "frames": 0, "last_ts": 0.0,
+        "history": deque(maxlen=TEMPORAL_HISTORY),
+    }
+
+def next_temporal_state(t, frame_state):
+    """
+    Histéresis entre NORMAL, SMOKE_WARNING y FIRE_CONFIRMED.
+    Se sube con un frame fuerte (fuse_decision) o con score suavizado medio que
+    persiste en la misma zona; se baja solo cuando el score suavizado cae bajo
+    el umbral de release.
+    """
+    fire_temporal = t["fire_ema"] >= COMBINED_CONFIRM_THR and t["fire_persist"] >= TEMPORAL_MIN_PERSIST
+    smoke_temporal = t["smoke_ema"] >= COMBINED_CONFIRM_THR and t["smoke_persist"] >= TEMPORAL_MIN_PERSIST
+
+    if frame_state == "FIRE_CONFIRMED" or fire_temporal:
+        return "FIRE_CONFIRMED"
+    if t["state"] == "FIRE_CONFIRMED" and t["fire_ema"] >= FIRE_RELEASE_THR:
+        return "FIRE_CONFIRMED"
+    if frame_state == "SMOKE_WARNING" or smoke_temporal:
+        return "SMOKE_WARNING"
+    if t["state"] in ("FIRE_CONFIRMED", "SMOKE_WARNING") and t["smoke_ema"] >= SMOKE_RELEASE_THR:
+        return "SMOKE_WARNING"
+    return "NORMAL"
+
+def prune_temporal_tracks(now):
+    """Borra tracks vencidos (camera_id viene del cliente). Llamar con temporal_lock tomado."""
+    global temporal_last_prune
+    if now - temporal_last_prune < TEMPORAL_TTL_S / 4:
+        return
+    temporal_last_prune = now
+    for k in [k for k, t in temporal_tracks.items() if now - t["last_ts"] > TEMPORAL_TTL_S]:
+        del temporal_tracks[k]
+
+def update_temporal(key, event_id, frame_state, best_by_label, boxes, now=None):
+    """
+    Actualiza el estado temporal de la cámara con un frame nuevo y devuelve un resumen.
+    now (segundos) permite usar otro reloj, p. ej. la posición en un video grabado.
+    """
+    if now is None:
+        now = time.time()
+    fire = best_by_label.get("fire", 0.0)
+    smoke = best_by_label.get("smoke", 0.0)
+    fire_boxes = [b for b in boxes if b["label"] == "fire"]
+    smoke_boxes = [b for b in boxes if b["label"] == "smoke"]
+
+    with temporal_lock:
+        prune_temporal_tracks(now)
+        t = temporal_tracks.get(key)
+        if t is None or now - t["last_ts"] > TEMPORAL_TTL_S:
+            t = temporal_tracks[key] = new_track()
+
+        if t["fire_ema"] is not None:
+            dt = max(now - t["last_ts"], 0.0)
+            a = max(1.0 - math.exp(-dt / TEMPORAL_TAU_S), TEMPORAL_MIN_ALPHA)
+            if dt > 3 * TEMPORAL_TAU_S:
+                # Cajas de hace demasiado no cuentan como persistencia
+                t["fire_boxes"], t["smoke_boxes"] = [], []
+                t["fire_persist"] = t["smoke_persist"] = 0
+        else:
+            a = 1.0
+        t["fire_ema"] = a * fire + (1 - a) * (t["fire_ema"] or 0.0)
+        t["smoke_ema"] = a * smoke + (1 - a) * (t["smoke_ema"] or 0.0)
+        t["fire_persist"] = t["fire_persist"] + 1 if boxes_persist(t["fire_boxes"], fire_boxes) else int(bool(fire_boxes))
+        t["smoke_persist"] = t["smoke_persist"] + 1 if boxes_persist(t["smoke_boxes"], smoke_boxes) else int(bool(smoke_boxes))
+        t["fire_boxes"], t["smoke_boxes"] = fire_boxes, smoke_boxes
+
+        prev_state = t["state"]
+        t["state"] = next_temporal_state(t, frame_state)
+        t["frames"] += 1
+        t["last_ts"] = now
+
+        entry = {
+            "ts": int(now * 1000),
+            "event_id": event_id,
+            "frame_state": frame_state,
+            "state": t["state"],
+            "fire": round(fire, 4), "smoke": round(smoke, 4),
+            "fire_ema": round(t["fire_ema"], 4), "smoke_ema": round(t["smoke_ema"], 4),
+            "fire_persist": t["fire_persist"], "smoke_persist": t["smoke_persist"],
+        }
+        t["history"].append(entry)
+        frames = t["frames"]
+
+    if entry["state"] != prev_state:
+        log(f"[TEMPORAL] {key}: {prev_state} -> {entry['state']} (fire_ema={entry['fire_ema']} smoke_ema={entry['smoke_ema']})")
+    return dict(entry, camera=key, frames=frames, previous_state=prev_state)
+
 # ==========================
 # ROUTES
 # ==========================
@@ -188,13 +690,47 @@ def health():
         "models_load_time_seconds": models_load_time
     }), (200 if ok else 500)
 
+@app.route("/temporal", methods=["GET"])
+def temporal_state():
+    """
+    Sin parámetros: estado actual de cada cámara.
+    ?camera=<camera_id|rtsp_url>&limit=N: historial de esa cámara.
+    """
+    key = request.args.get("camera")
+    with temporal_lock:
+        if not key:
+            return jsonify({
+                k: {
+                    "state": t["state"],
+                    "fire_ema": t["fire_ema"], "smoke_ema": t["smoke_ema"],
+                    "frames": t["frames"], "last_ts": int(t["last_ts"] * 1000),
+                }
+                for k, t in temporal_tracks.items()
+            })
+
+        t = temporal_tracks.get(camera_key(None, key) or key)
+        if t is None:
+            return jsonify({"error": f"Unknown camera: {key}"}), 404
+        limit = request.args.get("limit", default=TEMPORAL_HISTORY, type=int)
+        history = list(t["history"])[-limit:] if limit > 0 else []
+        return jsonify({"camera": key, "state": t["state"], "frames": t["frames"], "history": history})
+
 @app.route("/analyze", methods=["POST"])
 def analyze():
+    # event_id como trace id (Flask cachea el JSON, run_analyze lo vuelve a leer)
+    body = request.get_json(silent=True)
+    body = body if isinstance(body, dict) else {}
+    with tracer.trace("analyze", body.get("event_id"), force=bool(body.get("trace", False))):
+        return run_analyze()
+
+def run_analyze():
     ts_jetson_start = int(time.time() * 1000)
     image_base64 = None  # SIEMPRE definido
 
     try:
-        if not load_models_lazy():
+        with tracer.span("load_models"):
+            models_ok = load_models_lazy()
+        if not models_ok:
             return jsonify({"error": "Models not loaded", "detail": models_error}), 500
 
         data = request.json
@@ -205,6 +741,8 @@ def analyze():
         image_base64_input = data.get("imageBase64")
         event_id = data.get("event_id", "unknown")
         sensor_data = data.get("sensors", {})
+        triggered = sensor_triggered(data)
+        cam_key = camera_key(data.get("camera_id"), rtsp_url)
 
         log(f"[ANALYZE] event_id={event_id} rtsp={rtsp_url} has_image={image_base64_input is not None} sensors={sensor_data}")
 
@@ -218,10 +756,10 @@ def analyze():
         if image_base64_input:
             try:
                 # Decode base64 image
-                img_data = base64.b64decode(image_base64_input)
-                import numpy as np
-                nparr = np.frombuffer(img_data, np.uint8)
-                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+                with tracer.span("decode", bytes=len(image_base64_input)):
+                    img_data = base64.b64decode(image_base64_input)
+                    nparr = np.frombuffer(img_data, np.uint8)
+                    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
                 if frame is None:
                     err = "Failed to decode base64 image"
             except Exception as e:
@@ -232,50 +770,94 @@ def analyze():
                 rtsp_url = f"{rtsp_url}{sep}rtsp_transport=udp"
 
             t0 = time.time()
-            frame, err = capture_frame_from_rtsp(rtsp_url)
+            with tracer.span("rtsp"):
+                frame, err = capture_frame_from_rtsp(rtsp_url)
             t_rtsp = int((time.time() - t0) * 1000)
 
         if frame is None:
             return jsonify({"error": f"Input Error: {err}", "timings_ms": {"rtsp": t_rtsp}}), 500
 
-        frame = maybe_resize(frame)
+        # Recorte por ROI sobre el frame a resolución completa
+        t_roi0 = time.time()
+        with tracer.span("roi") as sp:
+            roi = get_camera_roi(cam_key)
+            tiled = should_tile(frame, triggered, data.get("tiled"))
+            inputs, regions = prepare_inputs(frame, roi, tiled)
+            frame = maybe_resize(frame)
+            if sp is not None:
+                sp["attrs"].update(roi=roi is not None, tiled=tiled, inputs=len(inputs))
+        t_roi = int((time.time() - t_roi0) * 1000)
+
+        # Pre-filtro barato: frames claramente vacíos no pagan YOLO
+        t_screen0 = time.time()
+        with tracer.span("screen") as sp:
+            # Con tiles se buscan justamente llamas chicas: el pre-filtro no puede vetarlas
+            screen = screen_frames(inputs, force=triggered or tiled or bool(data.get("skip_screen", False)))
+            if sp is not None:
+                sp["attrs"]["decision"] = screen["decision"]
+        t_screen = int((time.time() - t_screen0) * 1000)
 
         # Infer Unified Model
         t1 = time.time()
         conf_thresh = min(CONF_FIRE, CONF_SMOKE)
-        boxes, best_by_label = yolo_infer(unified_model, frame, conf=conf_thresh, iou=IOU_NMS)
+        boxes, best_by_label = [], {}
+        if screen["decision"] != "reject":
+            with tracer.span("infer"):
+                outputs = yolo_infer_batch(unified_model, inputs, conf=conf_thresh, iou=IOU_NMS)
+                with tracer.span("collect"):
+                    boxes, best_by_label = collect_detections(outputs, regions)
         t_infer = int((time.time() - t1) * 1000)
 
-        # Extract scores for fusion logic
-        fire_best = {'fire': best_by_label['fire']} if 'fire' in best_by_label else {}
-        smoke_best = {'smoke': best_by_label['smoke']} if 'smoke' in best_by_label else {}
+        state, confidence, smoke_conf = decide(best_by_label)
 
-        state, confidence, smoke_conf = fuse_decision(fire_best, smoke_best)
+        # Estado temporal por cámara (sin cámara identificable: solo el frame)
+        frame_state, temporal = state, None
+        if TEMPORAL_ENABLED and cam_key:
+            with tracer.span("temporal"):
+                temporal = update_temporal(cam_key, event_id, frame_state, best_by_label, boxes)
+            state = temporal["state"]
+            if state == "FIRE_CONFIRMED":
+                confidence = max(confidence, temporal["fire_ema"])
+            elif state == "SMOKE_WARNING":
+                confidence = max(confidence, temporal["smoke_ema"])
 
         if bool(data.get("include_image", False)):
-            image_base64 = encode_jpg_base64(frame, quality=80)
+            with tracer.span("encode_image"):
+                image_base64 = encode_jpg_base64(frame, quality=80)
 
         ts_end = int(time.time() * 1000)
-
-        return jsonify({
-            "event_id": event_id,
-            "state": state,
-            "fireDetected": state == "FIRE_CONFIRMED",
-            "smokeDetected": state in ["SMOKE_WARNING", "FIRE_CONFIRMED"],
-            "confidence": float(confidence),
-            "confidence_smoke": float(smoke_conf),
-            "detections": {
-                "unified_model": {
-                    "model_path": MODEL_PATH,
-                    "best_by_label": best_by_label,
-                    "boxes": boxes
+        tracer.annotate(state=state, camera=cam_key)
+
+        with tracer.span("serialize"):
+            return jsonify({
+                "event_id": event_id,
+                "state": state,
+                "frame_state": frame_state,
+                "temporal": temporal,
+                "fireDetected": state == "FIRE_CONFIRMED",
+                "smokeDetected": state in ["SMOKE_WARNING", "FIRE_CONFIRMED"],
+                "confidence": float(confidence),
+                "confidence_smoke": float(smoke_conf),
+                "detections": {
+                    "unified_model": {
+                        "model_path": MODEL_PATH,
+                        "best_by_label": best_by_label,
+                        "boxes": boxes,
+                        "roi": {"camera": cam_key, "mode": roi.get("mode", "crop"), "regions": regions} if roi else None,
+                        "tiled": tiled,
+                        "inputs": len(inputs)
+                    },
+                    "screen": screen
+                },
+                "image_base64": image_base64,
+                "ts": int(time.time() * 1000),
+                "timestamps": {"jetson_start": ts_jetson_start, "jetson_end": ts_end},
+                "timings_ms": {
+                    "rtsp": t_rtsp, "roi": t_roi,
+                    "screen": t_screen, "screen_decision": screen["decision"],
+                    "infer": t_infer
                 }
-            },
-            "image_base64": image_base64,
-            "ts": int(time.time() * 1000),
-            "timestamps": {"jetson_start": ts_jetson_start, "jetson_end": ts_end},
-            "timings_ms": {"rtsp": t_rtsp, "infer": t_infer}
-        })
+            })
 
     except Exception as e:
         log("[ERROR] analyze failed:")
@@ -0,0 +1,215 @@
+"""
+Análisis offline de grabaciones con el mismo modelo y la misma lógica de /analyze.
+
+Entradas: archivos de video y/o directorios de frames (jpg/png, orden alfabético).
+Etapas solapadas en un pipeline:
+  - hilo de decodificación: lee frames con stride (grab() sin decodificar los saltados)
+  - hilo principal: pre-filtro + inferencia del modelo unificado en batches
+  - hilo de escritura: una línea JSONL por frame con detecciones, estado de fuse_decision
+    y estado temporal (cada archivo / directorio cuenta como una cámara)
+
+Uso:
+  python batch_analyze.py grabaciones/ cam1_2024-05-01.mp4 --stride 10 --batch 16 --out incidente.jsonl
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+import cv2
+
+import app
+from app import (
+    load_models_lazy, get_camera_roi, prepare_inputs, should_tile, screen_frames, yolo_infer_batch,
+    collect_detections, decide, update_temporal, log, CONF_FIRE, CONF_SMOKE, IOU_NMS, TEMPORAL_ENABLED,
+)
+
+VIDEO_EXTS = {".mp4", ".avi", ".mkv", ".mov", ".h264", ".ts"}
+IMAGE_EXTS = {".jpg", ".jpeg", ".png"}
+_END = object()
+
+
+def expand_inputs(paths):
+    """Videos sueltos, directorios de videos o directorios de frames -> [(tipo, ruta)]."""
+    sources = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            files = sorted(f for f in p.iterdir() if f.is_file())
+            videos = [f for f in files if f.suffix.lower() in VIDEO_EXTS]
+            images = [f for f in files if f.suffix.lower() in IMAGE_EXTS]
+            sources.extend(("video", f) for f in videos)
+            if images:
+                sources.append(("frames", p))
+        elif p.suffix.lower() in VIDEO_EXTS:
+            sources.append(("video", p))
+        else:
+            log(f"[BATCH] ⚠️  Entrada ignorada: {p}")
+    return sources
+
+
+def iter_video(path, stride):
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        log(f"[BATCH] ❌ No se pudo abrir {path}")
+        return
+    try:
+        idx = 0
+        while True:
+            if idx % stride:
+                # Saltar sin decodificar a BGR
+                if not cap.grab():
+                    break
+            else:
+                ret, frame = cap.read()
+                if not ret or frame is None:
+                    break
+                yield idx, int(cap.get(cv2.CAP_PROP_POS_MSEC)), frame
+            idx += 1
+    finally:
+        cap.release()
+
+
+def iter_frames_dir(path, stride):
+    files = sorted(f for f in Path(path).iterdir() if f.suffix.lower() in IMAGE_EXTS)
+    for idx in range(0, len(files), stride):
+        frame = cv2.imread(str(files[idx]))
+        if frame is not None:
+            yield idx, None, frame
+
+
+def decode_worker(sources, stride, out_q, stop):
+    try:
+        for kind, path in sources:
+            log(f"[BATCH] 🎞️  Decodificando {path}")
+            frames = iter_video(path, stride) if kind == "video" else iter_frames_dir(path, stride)
+            for idx, pos_ms, frame in frames:
+                if stop.is_set():
+                    return
+                out_q.put((str(path), idx, pos_ms, frame))
+    finally:
+        out_q.put(_END)
+
+
+def write_worker(out_path, in_q):
+    with open(out_path, "w", encoding="utf-8") as f:
+        while True:
+            item = in_q.get()
+            if item is _END:
+                break
+            f.write(json.dumps(item) + "\n")
+
+
+def run_batch(pending, conf, write_q):
+    """pending: [(meta, inputs, regions, screen)] -> infiere todos los inputs en una llamada."""
+    to_infer = [p for p in pending if p[3]["decision"] != "reject"]
+    flat = [x for p in to_infer for x in p[1]]
+    outputs = iter(yolo_infer_batch(app.unified_model, flat, conf=conf, iou=IOU_NMS)) if flat else iter(())
+
+    for (source, idx, pos_ms), inputs, regions, screen in pending:
+        boxes, best_by_label = [], {}
+        if screen["decision"] != "reject":
+            per_frame = [next(outputs) for _ in inputs]
+            boxes, best_by_label = collect_detections(per_frame, regions)
+        state, confidence, smoke_conf = decide(best_by_label)
+        # Cada archivo / directorio se trata como una cámara para la fusión temporal.
+        # En videos el reloj es la posición en la grabación (respeta --stride y no
+        # depende de la velocidad de procesamiento); en directorios de frames, el real.
+        temporal = None
+        if TEMPORAL_ENABLED:
+            now = pos_ms / 1000.0 if pos_ms is not None else None
+            temporal = update_temporal(source, None, state, best_by_label, boxes, now=now)
+        write_q.put({
+            "source": source,
+            "frame_index": idx,
+            "pos_ms": pos_ms,
+            "state": state,
+            "temporal_state": temporal["state"] if temporal else None,
+            "confidence": float(confidence),
+            "confidence_smoke": float(smoke_conf),
+            "best_by_label": best_by_label,
+            "boxes": boxes,
+            "screen": screen,
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Análisis offline de videos / directorios de frames")
+    parser.add_argument("inputs", nargs="+", help="archivos de video o directorios")
+    parser.add_argument("--out", default="batch_results.jsonl")
+    parser.add_argument("--stride", type=int, default=5, help="analizar 1 de cada N frames")
+    parser.add_argument("--batch", type=int, default=16, help="frames por llamada al modelo")
+    parser.add_argument("--camera-id", help="aplicar las ROIs de esta cámara (camera_rois.json)")
+    parser.add_argument("--tiled", action=argparse.BooleanOptionalAction, default=None,
+                        help="forzar (--tiled) o desactivar (--no-tiled) tiles a resolución completa "
+                             "(por defecto solo en frames grandes)")
+    parser.add_argument("--no-screen", action="store_true", help="desactivar el pre-filtro")
+    parser.add_argument("--queue-size", type=int, default=64)
+    args = parser.parse_args()
+
+    sources = expand_inputs(args.inputs)
+    if not sources:
+        log("[BATCH] ❌ No hay videos ni frames para procesar")
+        return
+    if not load_models_lazy():
+        log(f"[BATCH] ❌ Modelo no disponible: {app.models_error}")
+        return
+
+    roi = get_camera_roi(args.camera_id)
+    conf = min(CONF_FIRE, CONF_SMOKE)
+
+    decode_q = queue.Queue(maxsize=args.queue_size)
+    write_q = queue.Queue(maxsize=args.queue_size * 4)
+    stop = threading.Event()
+    decoder = threading.Thread(target=decode_worker, args=(sources, max(args.stride, 1), decode_q, stop), daemon=True)
+    writer = threading.Thread(target=write_worker, args=(args.out, write_q), daemon=True)
+    decoder.start()
+    writer.start()
+
+    t0 = time.time()
+    frames = 0
+    pending, pending_inputs = [], 0
+    try:
+        while True:
+            item = decode_q.get()
+            if item is _END:
+                break
+            source, idx, pos_ms, frame = item
+            tiled = should_tile(frame, requested=args.tiled)
+            inputs, regions = prepare_inputs(frame, roi, tiled)
+            # Frames con tiles van siempre al modelo (objetivo: llamas chicas y lejanas)
+            screen = screen_frames(inputs, force=args.no_screen or tiled)
+            pending.append(((source, idx, pos_ms), inputs, regions, screen))
+            if screen["decision"] != "reject":
+                pending_inputs += len(inputs)
+            frames += 1
+
+            # Frames descartados por el pre-filtro no cuentan para el batch pero sí ocupan memoria
+            if pending_inputs >= args.batch or len(pending) >= args.batch * 4:
+                run_batch(pending, conf, write_q)
+                pending, pending_inputs = [], 0
+            if frames % 500 == 0:
+                log(f"[BATCH] {frames} frames ({frames / (time.time() - t0):.1f} fps)")
+
+        if pending:
+            run_batch(pending, conf, write_q)
+    finally:
+        # Ante un error o Ctrl-C: frenar el decoder (vaciando la cola por si está bloqueado
+        # en put) y cerrar igual el JSONL con lo ya escrito.
+        stop.set()
+        while decoder.is_alive():
+            try:
+                decode_q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        write_q.put(_END)
+        writer.join()
+
+    elapsed = time.time() - t0
+    log(f"[BATCH] ✅ {frames} frames en {elapsed:.1f}s ({frames / max(elapsed, 1e-6):.1f} fps) -> {os.path.abspath(args.out)}")
+
+
+if __name__ == "__main__":
+    main()
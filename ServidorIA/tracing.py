@@ -0,0 +1,183 @@
+"""
+Tracing liviano por request: spans anidados por etapa, con event_id como trace id.
+
+- Muestreo por request (sample_rate) o forzado (solo si allow_force); sin trace activo
+  span() es casi gratis.
+- Los spans se acumulan en memoria y se escriben en batch (por cantidad o cada
+  flush_interval_s) a un JSONL con rotación (RotatingFileHandler).
+- Opcional: cProfile muestreado; el .prof se guarda solo si el request supera
+  profile_threshold_ms.
+"""
+import atexit
+import cProfile
+import json
+import logging
+import logging.handlers
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+class Tracer:
+    def __init__(self, path, sample_rate=0.0, allow_force=True, max_bytes=10 * 1024 * 1024, backups=5,
+                 flush_spans=200, flush_interval_s=5.0,
+                 profile_dir=None, profile_sample_rate=0.0, profile_threshold_ms=1000):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.allow_force = allow_force
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_spans = flush_spans
+        self.flush_interval_s = flush_interval_s
+        self.profile_dir = profile_dir
+        self.profile_sample_rate = profile_sample_rate
+        self.profile_threshold_ms = profile_threshold_ms
+
+        self._local = threading.local()
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self._logger = None
+        self._flusher = None
+
+    # ---------- API ----------
+    @contextmanager
+    def trace(self, name, trace_id=None, force=False, **attrs):
+        """Span raíz de un request. Decide el muestreo una sola vez por trace."""
+        sampled = (force and self.allow_force) or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        profiler = self._maybe_start_profiler()
+        if not sampled and profiler is None:
+            yield None
+            return
+
+        if not trace_id or trace_id == "unknown":
+            trace_id = uuid.uuid4().hex
+        ctx = {"trace_id": str(trace_id), "stack": [], "spans": [], "sampled": sampled}
+        self._local.ctx = ctx
+        t0 = time.time()
+        try:
+            with self.span(name, **attrs) as root:
+                yield root
+        finally:
+            self._local.ctx = None
+            duration_ms = (time.time() - t0) * 1000
+            if profiler is not None:
+                self._finish_profiler(profiler, ctx["trace_id"], duration_ms)
+            if sampled:
+                self._enqueue(ctx["spans"])
+
+    @contextmanager
+    def span(self, name, **attrs):
+        ctx = getattr(self._local, "ctx", None)
+        if ctx is None or not ctx["sampled"]:
+            yield None
+            return
+
+        span = {
+            "trace_id": ctx["trace_id"],
+            "span_id": uuid.uuid4().hex[:16],
+            "parent_id": ctx["stack"][-1]["span_id"] if ctx["stack"] else None,
+            "name": name,
+            "start_ms": int(time.time() * 1000),
+            "attrs": attrs,
+        }
+        ctx["stack"].append(span)
+        t0 = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span["attrs"]["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span["dur_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+            ctx["stack"].pop()
+            ctx["spans"].append(span)
+
+    def annotate(self, **attrs):
+        """Agrega atributos al span activo (si hay uno)."""
+        ctx = getattr(self._local, "ctx", None)
+        if ctx is not None and ctx["sampled"] and ctx["stack"]:
+            ctx["stack"][-1]["attrs"].update(attrs)
+
+    def flush(self):
+        with self._buffer_lock:
+            spans, self._buffer = self._buffer, []
+        if not spans:
+            return
+        with self._write_lock:
+            logger = self._get_logger()
+            for span in spans:
+                logger.info(json.dumps(span, default=str))
+
+    # ---------- internos ----------
+    def _enqueue(self, spans):
+        with self._buffer_lock:
+            self._buffer.extend(spans)
+            full = len(self._buffer) >= self.flush_spans
+        self._ensure_flusher()
+        if full:
+            self.flush()
+
+    def _ensure_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._buffer_lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name="trace-flusher", daemon=True)
+            self._flusher.start()
+            atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval_s)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[TRACE] ❌ Error escribiendo spans: {type(e).__name__}: {e}", flush=True)
+
+    def _get_logger(self):
+        if self._logger is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            logger = logging.getLogger(f"tracing.{id(self)}")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    def _maybe_start_profiler(self):
+        if not self.profile_dir or self.profile_sample_rate <= 0:
+            return None
+        if random.random() >= self.profile_sample_rate:
+            return None
+        # Un solo cProfile activo a la vez
+        if not self._profile_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            self._profile_lock.release()
+            return None
+        return profiler
+
+    def _finish_profiler(self, profiler, trace_id, duration_ms):
+        try:
+            profiler.disable()
+            if duration_ms >= self.profile_threshold_ms:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", trace_id)[:80]
+                path = os.path.join(self.profile_dir, f"{safe_id}_{int(duration_ms)}ms.prof")
+                profiler.dump_stats(path)
+                print(f"[TRACE] 🐢 Request lento ({duration_ms:.0f} ms), perfil en {path}", flush=True)
+        finally:
+            self._profile_lock.release()
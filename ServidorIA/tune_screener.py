@@ -0,0 +1,105 @@
+"""
+Ajusta los umbrales del pre-filtro (SCREEN_FIRE_MIN_PX / SCREEN_SMOKE_THR de app.py)
+contra un split de evaluación en formato YOLO (data_unified_yolo/<split>/images|labels).
+
+Para cada par de umbrales calcula:
+  - recall: imágenes con fuego/humo etiquetado que pasan el filtro
+  - pass_rate_neg: imágenes sin etiquetas que igual pagarían YOLO
+y recomienda el par con recall >= --target-recall que menos negativos deja pasar.
+Las imágenes pasan por maybe_resize igual que en /analyze, así fire_px queda en la
+misma escala que en producción.
+
+Uso:
+  python tune_screener.py --data ModeloNuevo/data_unified_yolo --split val --target-recall 0.98
+"""
+import argparse
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app import screen_features, maybe_resize, SCREEN_FIRE_MIN_PX, SCREEN_SMOKE_THR
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png"}
+
+
+def load_split(data_dir, split, limit=None):
+    images_dir = Path(data_dir) / split / "images"
+    labels_dir = Path(data_dir) / split / "labels"
+    paths = sorted(p for p in images_dir.iterdir() if p.suffix.lower() in IMAGE_EXTS)
+    if limit:
+        paths = paths[:limit]
+
+    features, positives = [], []
+    for i, p in enumerate(paths):
+        frame = cv2.imread(str(p))
+        if frame is None:
+            continue
+        label_path = labels_dir / f"{p.stem}.txt"
+        has_label = label_path.exists() and os.path.getsize(label_path) > 0
+        features.append(screen_features(maybe_resize(frame)))
+        positives.append(has_label)
+        if (i + 1) % 500 == 0:
+            print(f"  {i + 1}/{len(paths)} imágenes")
+
+    return np.array(features, dtype=np.float64).reshape(-1, 2), np.array(positives, dtype=bool)
+
+
+def evaluate(features, positives, fire_thr, smoke_thr):
+    passed = (features[:, 0] >= fire_thr) | (features[:, 1] >= smoke_thr)
+    recall = passed[positives].mean() if positives.any() else float("nan")
+    pass_rate_neg = passed[~positives].mean() if (~positives).any() else float("nan")
+    return recall, pass_rate_neg, passed.mean()
+
+
+def candidate_thresholds(values, n=25):
+    # Un umbral 0 deja pasar todo; el mínimo útil es "al menos algún píxel"
+    qs = np.quantile(values, np.linspace(0.0, 1.0, n))
+    return sorted(set(max(float(q), 1e-6) for q in qs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ajuste de umbrales del pre-filtro HSV")
+    parser.add_argument("--data", default=os.path.join("ModeloNuevo", "data_unified_yolo"))
+    parser.add_argument("--split", default="val")
+    parser.add_argument("--target-recall", type=float, default=0.98)
+    parser.add_argument("--limit", type=int, help="máximo de imágenes a evaluar")
+    args = parser.parse_args()
+
+    print(f"[TUNE] Calculando features en {args.data}/{args.split} ...")
+    features, positives = load_split(args.data, args.split, args.limit)
+    if not len(features):
+        print("[TUNE] ❌ No hay imágenes para evaluar")
+        return
+    print(f"[TUNE] {len(features)} imágenes ({positives.sum()} con fuego/humo)")
+
+    recall, neg, total = evaluate(features, positives, SCREEN_FIRE_MIN_PX, SCREEN_SMOKE_THR)
+    print(f"\n[TUNE] Actual  fire_px={SCREEN_FIRE_MIN_PX} smoke={SCREEN_SMOKE_THR}: "
+          f"recall={recall:.3f} pass_rate_neg={neg:.3f} pass_rate={total:.3f}")
+
+    pos = features[positives] if positives.any() else features
+    results = []
+    for fire_thr in candidate_thresholds(pos[:, 0]):
+        for smoke_thr in candidate_thresholds(pos[:, 1]):
+            recall, neg, total = evaluate(features, positives, fire_thr, smoke_thr)
+            results.append((fire_thr, smoke_thr, recall, neg, total))
+
+    valid = [r for r in results if r[2] >= args.target_recall]
+    if not valid:
+        print(f"[TUNE] ⚠️  Ningún par alcanza recall >= {args.target_recall}")
+        valid = sorted(results, key=lambda r: -r[2])[:1]
+
+    # Menos negativos que pasan (o menos frames en total si no hay negativos)
+    valid.sort(key=lambda r: (r[3] if not np.isnan(r[3]) else r[4], -r[2]))
+    print("\n  fire_px  smoke_thr  recall  pass_rate_neg  pass_rate")
+    for fire_thr, smoke_thr, recall, neg, total in valid[:10]:
+        print(f" {fire_thr:8.1f}  {smoke_thr:9.5f}  {recall:6.3f}  {neg:13.3f}  {total:9.3f}")
+
+    best = valid[0]
+    print(f"\n[TUNE] ✅ Recomendado para app.py (y luego SCREEN_ENABLED = True):\n"
+          f"SCREEN_FIRE_MIN_PX = {best[0]:.6g}\nSCREEN_SMOKE_THR = {best[1]:.6g}")
+
+
+if __name__ == "__main__":
+    main()